@@ -4,15 +4,22 @@ Train a GAN to generate MNIST digits.
 Uses a feature matching objective.
 """
 
+from functools import lru_cache
 from math import sqrt
+import os
+import re
 import sys
 
-from matplotlib import pyplot
 import numpy as np
 import tensorflow as tf
-from tensorflow.examples.tutorials.mnist import input_data
+from tensorflow.core.protobuf import rewriter_config_pb2
+from tensorflow.python.client import device_lib
+from tensorflow.python.tools import optimize_for_inference_lib
 
 SAVE_FILE = 'gan.ckpt'
+SAVE_INTERVAL = 100
+LOG_INTERVAL = 10
+FROZEN_FILE = 'gan_frozen.pb'
 GRID_SIZE = 5
 
 def main():
@@ -20,13 +27,15 @@ def main():
     Train or generate digits.
     """
     if len(sys.argv) < 2:
-        print('Usage: mnist_gan <create | train | generate>')
+        print('Usage: mnist_gan <create | train | freeze | generate>')
         sys.exit()
 
     if sys.argv[1] == 'create':
         create()
     elif sys.argv[1] == 'train':
         train()
+    elif sys.argv[1] == 'freeze':
+        freeze()
     elif sys.argv[1] == 'generate':
         generate()
     else:
@@ -38,8 +47,9 @@ def create():
     Create a new model and save it.
     """
     GAN()
+    tf.train.get_or_create_global_step()
     saver = tf.train.Saver()
-    with tf.Session() as sess:
+    with tf.Session(config=session_config()) as sess:
         sess.run(tf.global_variables_initializer())
         saver.save(sess, SAVE_FILE)
 
@@ -48,40 +58,95 @@ def train():
     Load and train a model.
     """
     gan = GAN()
-    saver = tf.train.Saver()
-
-    samples = Samples()
+    global_step = tf.train.get_or_create_global_step()
+    saver = tf.train.Saver(max_to_keep=3)
 
-    gen_obj = gan.generator_objective(samples.noise, samples.images)
-    gen_opt = tf.train.AdamOptimizer(learning_rate=1e-4)
-    opt_gen = gen_opt.minimize(gen_obj, var_list=gan.generator_vars())
+    samples = Samples(data_format=gan.data_format)
 
-    disc_obj = gan.discriminator_objective(samples.noise, samples.images)
-    disc_opt = tf.train.AdamOptimizer(learning_rate=1e-4)
+    generated = gan.generate(samples.noise, training=True)
+    disc_obj = gan.discriminator_objective(generated, samples.images)
+    disc_opt = gan.optimizer(learning_rate=1e-4)
     opt_disc = disc_opt.minimize(disc_obj, var_list=gan.discriminator_vars())
 
-    with tf.Session() as sess:
+    # Chain the generator update after the discriminator update
+    # so that a whole training step is a single session.run.
+    # Only the gradients go inside the control dependency, since
+    # the optimizer's slot initializers must not depend on it.
+    gen_opt = gan.optimizer(learning_rate=1e-4)
+    with tf.control_dependencies([opt_disc]):
+        gen_obj = gan.generator_objective(generated, samples.images)
+        gen_grads = gen_opt.compute_gradients(gen_obj,
+                                              var_list=gan.generator_vars())
+    # Sum the losses on the device and only fetch them for logging.
+    loss_sums = tf.Variable(tf.zeros([2]), trainable=False)
+    add_losses = tf.assign_add(loss_sums, tf.stack([disc_obj, gen_obj]))
+    train_step = tf.group(gen_opt.apply_gradients(gen_grads), add_losses,
+                          tf.assign_add(global_step, 1),
+                          *tf.get_collection(tf.GraphKeys.UPDATE_OPS))
+
+    with tf.Session(config=session_config()) as sess:
         sess.run(tf.global_variables_initializer())
-        saver.restore(sess, SAVE_FILE)
-        while True:
-            batch = samples.sample_feed_dict()
-            print('disc=%f gen=%f' % (sess.run(disc_obj, feed_dict=batch),
-                                      sess.run(gen_obj, feed_dict=batch)))
-            sess.run(opt_disc, feed_dict=batch)
-            sess.run(opt_gen, feed_dict=batch)
-            saver.save(sess, SAVE_FILE)
+        restore_latest(saver, sess)
+        state = tf.train.get_checkpoint_state(save_dir())
+        saver.recover_last_checkpoints(state.all_model_checkpoint_paths)
+        samples.initialize(sess)
+        step = sess.run(global_step)
+        last_log = step
+        try:
+            while True:
+                sess.run(train_step)
+                step += 1
+                if step % LOG_INTERVAL == 0:
+                    summed_steps = step - last_log
+                    disc_loss, gen_loss = sess.run(loss_sums) / summed_steps
+                    sess.run(loss_sums.initializer)
+                    last_log = step
+                    print('step %d: disc=%f gen=%f' %
+                          (step, disc_loss, gen_loss))
+                if step % SAVE_INTERVAL == 0:
+                    saver.save(sess, SAVE_FILE, global_step=step)
+        except KeyboardInterrupt:
+            saver.save(sess, SAVE_FILE, global_step=step)
+
+def freeze():
+    """
+    Export the latest model as a frozen inference graph,
+    with variables turned into constants and batch norms
+    folded into the convolutions.
+
+    The graph is always NHWC and float32, so it runs on any
+    host and the filters reach Conv2D as constants (which
+    batch norm folding requires).
+    The generator's weights are the same in every layout.
+    """
+    gan = GAN(data_format='NHWC', dtype=tf.float32)
+    saver = tf.train.Saver()
+    noise = tf.placeholder(tf.float32, shape=[None, 100], name='noise')
+    tf.identity(gan.generate(noise), name='generated')
+    with tf.Session(config=session_config()) as sess:
+        restore_latest(saver, sess)
+        graph_def = tf.graph_util.convert_variables_to_constants(
+            sess, sess.graph_def, ['generated'])
+    graph_def = optimize_for_inference_lib.optimize_for_inference(
+        graph_def, ['noise'], ['generated'], tf.float32.as_datatype_enum)
+    with tf.gfile.GFile(FROZEN_FILE, 'wb') as out_file:
+        out_file.write(graph_def.SerializeToString())
 
 def generate():
     """
-    Generate images from the model.
+    Generate images from the frozen model.
     """
-    gan = GAN()
-    saver = tf.train.Saver()
-    noise = tf.Variable(tf.random_normal([GRID_SIZE**2, 100]))
-    with tf.Session() as sess:
-        sess.run(tf.global_variables_initializer())
-        saver.restore(sess, SAVE_FILE)
-        out = np.array(sess.run(gan.generate(noise)))
+    from matplotlib import pyplot
+    if not os.path.exists(FROZEN_FILE):
+        print('No frozen model found; run: mnist_gan freeze')
+        sys.exit(1)
+    graph_def = tf.GraphDef()
+    with tf.gfile.GFile(FROZEN_FILE, 'rb') as in_file:
+        graph_def.ParseFromString(in_file.read())
+    tf.import_graph_def(graph_def, name='')
+    noise = np.random.normal(size=[GRID_SIZE**2, 100])
+    with tf.Session(config=session_config()) as sess:
+        out = sess.run('generated:0', feed_dict={'noise:0': noise})
         cols = [out[i*GRID_SIZE:(i+1)*GRID_SIZE].reshape([28*GRID_SIZE, 28])
                 for i in range(0, GRID_SIZE)]
         grid = np.concatenate(cols, axis=1)
@@ -94,31 +159,42 @@ class GAN:
     A small Generative Adversarial Network for producing
     MNIST digits.
     """
-    def __init__(self, noise_size=100):
+    def __init__(self, noise_size=100, data_format=None, dtype=None):
         """
         Create a new GAN with random weights.
+
+        Images are laid out according to data_format, which
+        is either 'NHWC' or 'NCHW'.
+        If it is None, default_data_format() is used.
+
+        The networks compute in dtype, while the weights and
+        all outputs stay float32.
+        If it is None, default_dtype() is used.
         """
+        self.data_format = data_format or default_data_format()
+        self.dtype = dtype or default_dtype()
+        fmt = self.data_format
         self.generator = [
             FC(noise_size, 14 * 14),
             FC(14 * 14, 14 * 14),
             FC(14 * 14, 14 * 14),
-            Reshape([14, 14, 1]),
-            Resize([28, 28]),
-            Conv(1, 16),
-            Conv(16, 32),
-            Conv(32, 64),
-            Conv(64, 64),
-            Conv(64, 32),
-            Conv(32, 1, activation=False)
+            Reshape(image_shape(14, 1, fmt)),
+            Resize([28, 28], data_format=fmt),
+            Conv(1, 16, data_format=fmt, batch_norm=True),
+            Conv(16, 32, data_format=fmt, batch_norm=True),
+            Conv(32, 64, data_format=fmt, batch_norm=True),
+            Conv(64, 64, data_format=fmt, batch_norm=True),
+            Conv(64, 32, data_format=fmt, batch_norm=True),
+            Conv(32, 1, activation=False, data_format=fmt)
         ]
         self.discriminator = [
-            Conv(1, 16, strides=[2, 2]),
-            Conv(16, 32),
-            Conv(32, 32),
-            Conv(32, 32),
-            Conv(32, 32),
-            Conv(32, 16, strides=[2, 2]),
-            Reshape([7 * 7 * 16]),
+            Conv(1, 16, strides=[2, 2], data_format=fmt),
+            Conv(16, 32, data_format=fmt),
+            Conv(32, 32, data_format=fmt),
+            Conv(32, 32, data_format=fmt),
+            Conv(32, 32, data_format=fmt),
+            Conv(32, 16, strides=[2, 2], data_format=fmt),
+            Reshape([7 * 7 * 16], data_format=fmt),
             FC(784, 256),
             FC(256, 256),
         ]
@@ -126,11 +202,15 @@ class GAN:
             FC(256, 1, activation=False)
         ]
 
-    def generate(self, noise):
+    def generate(self, noise, training=False):
         """
         Apply the generator to the batch of noise.
+
+        If training is set, batch normalization uses batch
+        statistics rather than the moving averages.
         """
-        return tf.sigmoid(apply_network(self.generator, noise))
+        return tf.sigmoid(self.apply(self.generator, noise,
+                                     training=training))
 
     def discriminate(self, samples):
         """
@@ -138,24 +218,27 @@ class GAN:
         probability.
         """
         disc = self.discriminator + self.discriminator_final
-        return apply_network(disc, samples)
+        return self.apply(disc, samples)
 
-    def generator_objective(self, noise, samples):
+    def generator_objective(self, generated, samples):
         """
-        Get the objective (loss) for the generator.
+        Get the objective (loss) for the generator, given a
+        batch of generate() outputs.
         """
-        out_1 = apply_network(self.discriminator, self.generate(noise))
-        out_2 = apply_network(self.discriminator, samples)
+        joined = tf.concat([generated, samples], axis=0)
+        features = self.apply(self.discriminator, joined)
+        out_1, out_2 = tf.split(features, 2, axis=0)
         mean_1 = tf.reduce_mean(out_1, axis=0)
         mean_2 = tf.reduce_mean(out_2, axis=0)
         return tf.reduce_mean(tf.square(mean_1 - mean_2))
 
-    def discriminator_objective(self, noise, samples):
+    def discriminator_objective(self, generated, samples):
         """
-        Get the objective (loss) for the discriminator.
+        Get the objective (loss) for the discriminator, given
+        a batch of generate() outputs.
         """
-        out_1 = self.discriminate(self.generate(noise))
-        out_2 = self.discriminate(samples)
+        joined = tf.concat([generated, samples], axis=0)
+        out_1, out_2 = tf.split(self.discriminate(joined), 2, axis=0)
         labels_1 = tf.zeros(tf.shape(out_1))
         labels_2 = tf.ones(tf.shape(out_2))
         cost_1 = tf.nn.sigmoid_cross_entropy_with_logits(labels=labels_1,
@@ -164,6 +247,28 @@ class GAN:
                                                          logits=out_2)
         return tf.reduce_mean(cost_1) + tf.reduce_mean(cost_2)
 
+    def apply(self, network, inputs, training=False):
+        """
+        Apply one of the GAN's networks in its compute dtype
+        and get float32 outputs.
+        """
+        outputs = apply_network(network, tf.cast(inputs, self.dtype),
+                                training=training)
+        return tf.cast(outputs, tf.float32)
+
+    def optimizer(self, learning_rate):
+        """
+        Create an Adam optimizer for the GAN's objectives.
+
+        In float16, the loss is scaled dynamically so that
+        small gradients do not underflow in the backward pass.
+        """
+        opt = tf.train.AdamOptimizer(learning_rate=learning_rate)
+        if self.dtype != tf.float16:
+            return opt
+        return tf.train.experimental.MixedPrecisionLossScaleOptimizer(
+            opt, loss_scale='dynamic')
+
     def generator_vars(self):
         """
         Get the generator variables.
@@ -180,25 +285,34 @@ class Samples:
     """
     Manage random batches of MNIST samples and isotropic
     Gaussian noise.
+
+    The whole MNIST training set is kept in a device-side
+    variable, so sampling a batch is a single gather, and
+    the noise is generated on the device as well.
+    Call initialize() on a session before using the images.
     """
-    def __init__(self, batch_size=128, noise_size=100):
+    def __init__(self, batch_size=128, noise_size=100, data_format='NHWC'):
         self.batch_size = batch_size
         self.noise_size = noise_size
-        self.mnist = input_data.read_data_sets('MNIST_data', one_hot=True)
-        self.images = tf.placeholder(tf.float32, shape=[batch_size, 28, 28, 1])
-        self.noise = tf.placeholder(tf.float32, shape=[batch_size, noise_size])
-
-    def sample_feed_dict(self):
-        """
-        Get a dictionary of arguments to fill in for the
-        placeholders.
-        """
-        mnist_batch = self.mnist.train.next_batch(self.batch_size)[0]
-        noise_batch = np.random.normal(size=(self.batch_size, self.noise_size))
-        return {
-            self.images: mnist_batch.reshape((self.batch_size, 28, 28, 1)),
-            self.noise: noise_batch
-        }
+        from tensorflow.examples.tutorials.mnist import input_data
+        mnist = input_data.read_data_sets('MNIST_data', one_hot=True)
+        shape = [-1] + image_shape(28, 1, data_format)
+        self.mnist_images = mnist.train.images.reshape(shape)
+        self.images_in = tf.placeholder(tf.float32,
+                                        shape=self.mnist_images.shape)
+        self.all_images = tf.Variable(self.images_in, trainable=False,
+                                      collections=[])
+        indices = tf.random_uniform([batch_size], dtype=tf.int32,
+                                    maxval=len(self.mnist_images))
+        self.images = tf.gather(self.all_images, indices)
+        self.noise = tf.random_normal([batch_size, noise_size])
+
+    def initialize(self, sess):
+        """
+        Copy the MNIST images into the session.
+        """
+        sess.run(self.all_images.initializer,
+                 feed_dict={self.images_in: self.mnist_images})
 
 class FC:
     """
@@ -209,16 +323,18 @@ class FC:
         stddev = 1 / sqrt(in_count)
         self.weights = tf.Variable(tf.random_normal([in_count, out_count],
                                                     stddev=stddev))
-        self.biases = tf.Variable(tf.zeros([1, out_count]))
+        self.biases = tf.Variable(tf.zeros([out_count]))
 
-    def apply(self, inputs):
+    def apply(self, inputs, training=False):
         """
         Apply the layer to the batch of inputs.
         """
-        pre_activation = tf.matmul(inputs, self.weights) + self.biases
+        weights = tf.cast(self.weights.read_value(), inputs.dtype)
+        biases = tf.cast(self.biases.read_value(), inputs.dtype)
+        pre_activation = tf.nn.bias_add(tf.matmul(inputs, weights), biases)
         if not self.activation:
             return pre_activation
-        return selu(pre_activation)
+        return tf.nn.selu(pre_activation)
 
     def vars(self):
         """
@@ -229,14 +345,21 @@ class FC:
 class Reshape:
     """
     A layer to reshape inputs.
+
+    NCHW images are transposed to NHWC before reshaping, so
+    flattened features are in the same order (and the next
+    layer's weights mean the same thing) in either layout.
     """
-    def __init__(self, shape):
+    def __init__(self, shape, data_format='NHWC'):
         self.shape = shape
+        self.data_format = data_format
 
-    def apply(self, inputs):
+    def apply(self, inputs, training=False):
         """
         Apply the layer to a batch of inputs.
         """
+        if self.data_format == 'NCHW' and len(inputs.get_shape()) == 4:
+            inputs = tf.transpose(inputs, [0, 2, 3, 1])
         out = tf.reshape(inputs, [tf.shape(inputs)[0]] + self.shape)
         return out
 
@@ -248,16 +371,27 @@ class Reshape:
 
 class Resize:
     """
-    A layer to resize image inputs.
+    A layer to resize image inputs with nearest-neighbor
+    interpolation.
     """
-    def __init__(self, size):
+    def __init__(self, size, data_format='NHWC'):
         self.size = size
+        self.data_format = data_format
 
-    def apply(self, inputs):
+    def apply(self, inputs, training=False):
         """
         Apply the layer to a batch of inputs.
         """
-        return tf.image.resize_images(inputs, self.size)
+        if self.data_format == 'NHWC':
+            return tf.image.resize_nearest_neighbor(inputs, self.size)
+        # Nearest-neighbor resizing is a gather along each
+        # spatial axis, so NCHW needs no transposes.
+        out = inputs
+        for axis, out_size in zip([2, 3], self.size):
+            in_size = out.get_shape()[axis].value
+            indices = [i * in_size // out_size for i in range(out_size)]
+            out = tf.gather(out, indices, axis=axis)
+        return out
 
     def vars(self):
         """
@@ -268,39 +402,89 @@ class Resize:
 class Conv:
     """
     A 3x3 convolutional layer.
+
+    With batch_norm, the convolution is followed by a fused
+    batch normalization, whose offset takes the place of
+    the biases.
     """
-    def __init__(self, in_depth, out_depth, strides=None, activation=True):
+    def __init__(self, in_depth, out_depth, strides=None, activation=True,
+                 data_format='NHWC', batch_norm=False):
         self.activation = activation
         self.strides = strides
+        self.data_format = data_format
+        self.batch_norm = batch_norm
         shape = [3, 3, in_depth, out_depth]
         stddev = 1 / sqrt(in_depth * 9)
         self.filters = tf.Variable(tf.random_normal(shape, stddev=stddev))
-        self.biases = tf.Variable(tf.zeros([1, out_depth]))
+        self.biases = tf.Variable(tf.zeros([out_depth]))
+        if batch_norm:
+            self.scales = tf.Variable(tf.ones([out_depth]))
+            self.moving_mean = tf.Variable(tf.zeros([out_depth]),
+                                           trainable=False)
+            self.moving_variance = tf.Variable(tf.ones([out_depth]),
+                                               trainable=False)
 
-    def apply(self, inputs):
+    def apply(self, inputs, training=False):
         """
         Apply the layer to the batch of inputs.
-        """
-        conv_out = tf.nn.convolution(inputs, self.filters, 'SAME',
-                                     strides=self.strides)
-        pre_activation = conv_out + self.biases
+
+        In training mode, batch normalization uses the batch
+        statistics and adds moving average updates to the
+        tf.GraphKeys.UPDATE_OPS collection.
+        """
+        filters = tf.cast(self.filters.read_value(), inputs.dtype)
+        stride_y, stride_x = self.strides or [1, 1]
+        if self.data_format == 'NCHW':
+            strides = [1, 1, stride_y, stride_x]
+        else:
+            strides = [1, stride_y, stride_x, 1]
+        conv_out = tf.nn.conv2d(inputs, filters, strides, 'SAME',
+                                data_format=self.data_format)
+        if self.batch_norm:
+            pre_activation = self.normalize(conv_out, training)
+        else:
+            biases = tf.cast(self.biases.read_value(), inputs.dtype)
+            pre_activation = tf.nn.bias_add(conv_out, biases,
+                                            data_format=self.data_format)
         if not self.activation:
             return pre_activation
-        return selu(pre_activation)
+        return tf.nn.selu(pre_activation)
+
+    def normalize(self, conv_out, training, decay=0.99):
+        """
+        Apply fused batch normalization to the convolution.
+        """
+        norm_args = {'x': conv_out, 'scale': self.scales.read_value(),
+                     'offset': self.biases.read_value(),
+                     'data_format': self.data_format}
+        if not training:
+            out, _, _ = tf.nn.fused_batch_norm(
+                mean=self.moving_mean.read_value(),
+                variance=self.moving_variance.read_value(),
+                is_training=False, **norm_args)
+            return out
+        out, mean, variance = tf.nn.fused_batch_norm(**norm_args)
+        for moving, batch in [(self.moving_mean, mean),
+                              (self.moving_variance, variance)]:
+            update = tf.assign_sub(moving, (1 - decay) * (moving - batch))
+            tf.add_to_collection(tf.GraphKeys.UPDATE_OPS, update)
+        return out
 
     def vars(self):
         """
         Get the parameters of the layer.
         """
+        if self.batch_norm:
+            return [self.filters, self.biases, self.scales]
         return [self.filters, self.biases]
 
-def apply_network(network, inputs):
+def apply_network(network, inputs, training=False):
     """
     Apply a neural network (a list of layers).
     """
     sub_in = inputs
     for layer in network:
-        sub_in = layer.apply(sub_in)
+        sub_in = layer.apply(sub_in, training=training)
     return sub_in
 
 def network_vars(network):
@@ -312,14 +496,117 @@ def network_vars(network):
         res.extend(layer.vars())
     return res
 
-def selu(x):
+def save_dir():
     """
-    Self-normalizing ELU.
+    Get the directory that holds the checkpoints.
+    """
+    return os.path.dirname(os.path.abspath(SAVE_FILE))
+
+def latest_save_file():
+    """
+    Get the path of the most recently saved checkpoint.
+    """
+    return tf.train.latest_checkpoint(save_dir())
+
+def restore_latest(saver, sess):
+    """
+    Restore the most recent checkpoint, or exit with a
+    message if there is none or it was saved by an
+    incompatible version of the model.
+    """
+    save_file = latest_save_file()
+    if save_file is None:
+        print('No checkpoint found; run: mnist_gan create')
+        sys.exit(1)
+    try:
+        saver.restore(sess, save_file)
+    except (tf.errors.NotFoundError, tf.errors.InvalidArgumentError):
+        print('Checkpoint ' + save_file + ' does not match the model; ' +
+              'run: mnist_gan create')
+        sys.exit(1)
+
+@lru_cache(maxsize=None)
+def local_gpus():
+    """
+    Get the GPU devices TensorFlow can use.
+
+    Listing the devices creates them for the whole process,
+    so it is done once, with session_config()'s GPU options.
+    """
+    devices = device_lib.list_local_devices(session_config=session_config())
+    return [device for device in devices if device.device_type == 'GPU']
+
+def gpu_available():
+    """
+    Check if TensorFlow can use a GPU.
+    """
+    return len(local_gpus()) > 0
+
+def compute_capability(device):
+    """
+    Get a GPU's CUDA compute capability as (major, minor),
+    or (0, 0) if its description does not say.
+    """
+    match = re.search(r'compute capability: (\d+)\.(\d+)',
+                      device.physical_device_desc)
+    if not match:
+        return (0, 0)
+    return (int(match.group(1)), int(match.group(2)))
+
+def default_data_format():
+    """
+    Get the fastest image layout for the available devices.
+
+    cuDNN prefers channels-first, but the CPU convolution
+    kernels only support channels-last.
+    """
+    if gpu_available():
+        return 'NCHW'
+    return 'NHWC'
+
+def default_dtype():
+    """
+    Get the fastest compute dtype for the available devices.
+
+    Volta and newer GPUs (compute capability 7.0+) run
+    half-precision convolutions and matrix products much
+    faster on Tensor Cores.
+    Older GPUs have slow or no native float16 arithmetic,
+    so they use float32.
+    """
+    gpus = local_gpus()
+    if gpus and all(compute_capability(gpu) >= (7, 0) for gpu in gpus):
+        return tf.float16
+    return tf.float32
 
-    See https://github.com/bioinf-jku/SNNs/blob/master/selu.py.
+def image_shape(size, depth, data_format):
+    """
+    Get the shape of a square image (without the batch
+    dimension) in the given layout.
     """
-    alpha = 1.6732632423543772848170429916717
-    scale = 1.0507009873554804934193349852946
-    return scale * tf.where(x >= 0.0, x, alpha * tf.nn.elu(x))
+    if data_format == 'NCHW':
+        return [depth, size, size]
+    return [size, size, depth]
 
-main()
+def session_config():
+    """
+    Get the configuration for TensorFlow sessions.
+
+    The remapper fuses Conv2D+BiasAdd into a single kernel,
+    and XLA compiles clusters of the many small layer ops
+    into a handful of fused kernels.
+    The thread pools are sized for the local CPU, and GPU
+    memory is allocated as needed rather than all at once.
+    """
+    config = tf.ConfigProto(allow_soft_placement=True,
+                            intra_op_parallelism_threads=os.cpu_count(),
+                            inter_op_parallelism_threads=2)
+    config.gpu_options.allow_growth = True
+    rewrites = config.graph_options.rewrite_options
+    rewrites.remapping = rewriter_config_pb2.RewriterConfig.ON
+    jit_level = tf.OptimizerOptions.ON_1
+    config.graph_options.optimizer_options.global_jit_level = jit_level
+    return config
+
+if __name__ == '__main__':
+    main()